@@ -15,6 +15,8 @@
 #                                    along specified ROIs.
 # - fit_cloud_profile_gaussian2D(): Fits a 2D Gaussian profile to the cloud's optical density 
 #                                    along specified ROIs.
+# - fit_cloud_profile_moments(): Estimates the cloud amplitude, center and widths from the moments
+#                                 of its optical density, without fitting.
 # 
 # This class is particularly useful for researchers and engineers working in atomic physics 
 # laboratories, where the analysis of cloud profiles is crucial for understanding atomic 
@@ -23,64 +25,209 @@
 # -----------------------comments generated by chatGPT 3.5 -------------------
 
 
+from functools import lru_cache
+
 import numpy as np
-from scipy.optimize import curve_fit
+from joblib import Parallel, delayed
+from numba import njit, prange
+from scipy.optimize import least_squares
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _gaussian_2d_kernel(x: np.ndarray, y: np.ndarray, amplitude: float, xo: float, yo: float,
+                        sigma_x: float, sigma_y: float, theta: float, out: np.ndarray) -> None:
+    # Fills out[i, j] with the rotated gaussian at (x[j], y[i]): one exponential per pixel,
+    # the trigonometry is loop invariant
+    ct = np.cos(theta)
+    st = np.sin(theta)
+    inv2sx2 = 0.5 / sigma_x**2
+    inv2sy2 = 0.5 / sigma_y**2
+    for i in prange(y.shape[0]):
+        dy = y[i] - yo
+        for j in range(x.shape[0]):
+            dx = x[j] - xo
+            xr = ct * dx - st * dy
+            yr = st * dx + ct * dy
+            out[i, j] = amplitude * np.exp(-(xr * xr * inv2sx2 + yr * yr * inv2sy2))
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def compute_od(dark: np.ndarray, bright: np.ndarray, offset: float = 0.) -> np.ndarray:
+    # Optical density log10(bright / dark) - offset in a single pass over both images. Pixels
+    # where either image is 0 carry no information and are masked to an OD of 0, the dark image
+    # is floored at 1e-6 otherwise. The OD is float32 whatever the dtype of the images, integer
+    # frames included. Single precision constants keep float32 images from being promoted to
+    # float64 in the loop
+    optical_density = np.empty(dark.shape, dtype=np.float32)
+    offset = np.float32(offset)
+    for i in prange(dark.shape[0]):
+        for j in range(dark.shape[1]):
+            d = dark[i, j]
+            ratio = bright[i, j] / max(d, np.float32(1e-6))
+            optical_density[i, j] = np.log10(ratio) - offset if d != 0 and ratio > 0 else np.float32(0.)
+    return optical_density
+
+
+def gaussian(x: np.ndarray, amplitude: float, mean: float, stddev: float) -> np.ndarray:
+    return amplitude * np.exp(-((x - mean) / stddev) ** 2 / 2)
+
+
+def jac_gaussian(x: np.ndarray, amplitude: float, mean: float, stddev: float) -> np.ndarray:
+    # Analytic jacobian of gaussian, one column per parameter
+    u = (x - mean) / stddev
+    exp_term = np.exp(-u**2 / 2)
+    return np.stack((exp_term, amplitude * exp_term * u / stddev, amplitude * exp_term * u**2 / stddev), axis=-1)
+
+
+def gaussian_xy(xy: tuple, amplitude_x: float, mean_x: float, stddev_x: float,
+                amplitude_y: float, mean_y: float, stddev_y: float) -> np.ndarray:
+    # Profiles along x and y of the cloud, concatenated so that both are fitted at once
+    x, y = xy
+    return np.concatenate((gaussian(x, amplitude_x, mean_x, stddev_x), gaussian(y, amplitude_y, mean_y, stddev_y)))
+
+
+def jac_gaussian_xy(xy: tuple, amplitude_x: float, mean_x: float, stddev_x: float,
+                    amplitude_y: float, mean_y: float, stddev_y: float) -> np.ndarray:
+    # Analytic jacobian of gaussian_xy, block diagonal as the two profiles share no parameter
+    x, y = xy
+    jac = np.zeros((x.size + y.size, 6))
+    jac[:x.size, :3] = jac_gaussian(x, amplitude_x, mean_x, stddev_x)
+    jac[x.size:, 3:] = jac_gaussian(y, amplitude_y, mean_y, stddev_y)
+    return jac
+
+
+def gaussian_2d(xy: tuple, amplitude: float, xo: float, yo: float, sigma_x: float, sigma_y: float, theta: float = 0.) -> np.ndarray:
+    # x and y are broadcastable, of shapes (1, W) and (H, 1)
+    x, y = xy
+    if abs(theta) < 1e-6:
+        # Axis-aligned gaussian, separable in x and y: only H + W exponentials
+        g = amplitude * np.exp(-0.5 * ((y - yo) / sigma_y)**2) * np.exp(-0.5 * ((x - xo) / sigma_x)**2)
+    else:
+        g = np.empty((y.size, x.size))
+        _gaussian_2d_kernel(x.ravel(), y.ravel(), float(amplitude), float(xo), float(yo),
+                            float(sigma_x), float(sigma_y), float(theta), g)
+    return g.ravel()
+
+
+def jac_gaussian_2d(xy: tuple, amplitude: float, xo: float, yo: float, sigma_x: float, sigma_y: float, theta: float = 0.) -> np.ndarray:
+    # Analytic jacobian of gaussian_2d, one column per parameter
+    x, y = xy
+    dx = x - xo
+    dy = y - yo
+    # Two trigonometric calls, the double angle terms are derived from them
+    ct = np.cos(theta)
+    st = np.sin(theta)
+    cos_2 = ct * ct
+    sin_2 = st * st
+    sin_2t = 2 * ct * st
+    cos_2t = cos_2 - sin_2
+    inv2sx2 = 0.5 / sigma_x**2
+    inv2sy2 = 0.5 / sigma_y**2
+    a = cos_2 * inv2sx2 + sin_2 * inv2sy2
+    b = 0.5 * sin_2t * (inv2sy2 - inv2sx2)
+    c = sin_2 * inv2sx2 + cos_2 * inv2sy2
+    dx2 = dx * dx
+    dxdy = dx * dy
+    dy2 = dy * dy
+    if abs(theta) < 1e-6:
+        exp_term = np.exp(-c * dy2) * np.exp(-a * dx2)
+    else:
+        exp_term = np.exp(- (a * dx2 + 2 * b * dxdy + c * dy2))
+    g = amplitude * exp_term
+    # Derivatives of the quadratic form with respect to sigma_x, sigma_y and theta
+    dq_dsx = -(cos_2 * dx2 - sin_2t * dxdy + sin_2 * dy2) / sigma_x**3
+    dq_dsy = -(sin_2 * dx2 + sin_2t * dxdy + cos_2 * dy2) / sigma_y**3
+    da_dt = sin_2t * (inv2sy2 - inv2sx2)
+    db_dt = cos_2t * (inv2sy2 - inv2sx2)
+    dq_dt = da_dt * (dx2 - dy2) + 2 * db_dt * dxdy
+    return np.stack((exp_term,
+                     g * 2 * (a * dx + b * dy),
+                     g * 2 * (b * dx + c * dy),
+                     -g * dq_dsx,
+                     -g * dq_dsy,
+                     -g * dq_dt), axis=-1).reshape(-1, 6)
+
+
+def profile_moments(coord: np.ndarray, weights: np.ndarray) -> tuple:
+    # Mean and standard deviation of coord weighted by a profile, the negative (noise) part of
+    # the profile being ignored. Falls back to the centre and spread of coord for an empty profile
+    weights = np.clip(weights, 0, None)
+    if not np.any(weights):
+        return (coord[0] + coord[-1]) / 2, (coord[-1] - coord[0]) / 4
+    mean: float = np.average(coord, weights=weights)
+    return mean, np.sqrt(np.average((coord - mean)**2, weights=weights))
+
+
+def _residuals(params: np.ndarray, model, jac, coords, data: np.ndarray) -> np.ndarray:
+    return model(coords, *params) - data
+
+
+def _jac_residuals(params: np.ndarray, model, jac, coords, data: np.ndarray) -> np.ndarray:
+    # Parameters left out of params keep their default value and their columns are dropped
+    return jac(coords, *params)[:, :params.size]
+
+
+def lm_fit(model, jac, coords, data: np.ndarray, p0: tuple, tol: float) -> tuple:
+    # Levenberg-Marquardt fit of model(coords, *params) to data, with the analytic jacobian
+    # jac(coords, *params). Returns the optimal parameters and their covariance scaled by the
+    # reduced chi-squared, as curve_fit does
+    result = least_squares(_residuals, p0, jac=_jac_residuals, args=(model, jac, coords, data),
+                           method='lm', x_scale='jac', ftol=tol, xtol=tol)
+    if not result.success:
+        raise RuntimeError(f"Optimal parameters not found: {result.message}")
+    dof: int = data.size - result.x.size
+    pcov: np.ndarray = np.linalg.pinv(result.jac.T @ result.jac) * (2 * result.cost / dof)
+    return result.x, pcov
+
+
+@lru_cache(maxsize=16)
+def open_grid(x_start: int, x_end: int, y_start: int, y_end: int) -> tuple:
+    # Open grid (X, Y) of shapes (1, W) and (H, 1) for given bounds, read-only as it is shared by
+    # the fits. The camera frames keep the same shape during a session, so few ROIs are in use
+    Y, X = np.ogrid[y_start:y_end, x_start:x_end]
+    X.flags.writeable = False
+    Y.flags.writeable = False
+    return X, Y
 
 
 class AnalyseOD:
+    # Relative tolerances on the cost and on the parameters passed to the LM fits, the defaults of
+    # curve_fit: looser ones may stop the fits early, far from the optimum
+    _fit_tol: float = 1.49012e-8
+    # Relative chi-squared decrease, expected from releasing the rotation of the 2D gaussian,
+    # above which the rotation is fitted
+    _rotation_chi2_rtol: float = 1e-3
+
     def __init__(self, images: list, analys_ROI: list = None, normalization_ROI: list = None) -> None:
-        # Initialize with dark and bright images, and regions of interest
-        self.dark_image: np.ndarray = np.array(images[0], dtype=float)
-        self.bright_image: np.ndarray = np.array(images[1], dtype=float)
+        # Initialize with dark and bright images, and regions of interest.
+        # Single precision is enough for camera frames and halves the memory traffic. Frames
+        # that are already float32 are not copied
+        self.dark_image: np.ndarray = np.asarray(images[0], dtype=np.float32)
+        self.bright_image: np.ndarray = np.asarray(images[1], dtype=np.float32)
         self.analys_ROI: list = analys_ROI
         self.normalization_ROI: list = normalization_ROI
 
     def calculate_OD(self) -> np.ndarray:
-        # Calcute optical density
+        # Calculate optical density, log10(bright / dark), set to 0 where either image is 0 and
+        # with the dark image floored at 1e-6 elsewhere.
+        # The normalization ROI is a region without atoms: the OD is corrected by the ratio of
+        # the mean intensities of both images there, to compensate for a drift of the probe
+        # intensity between the two shots.
+        offset: float = 0.
         if self.normalization_ROI is not None:
             x_start: int = self.normalization_ROI[0]
             x_end: int = self.normalization_ROI[1]
             y_start: int = self.normalization_ROI[2]
             y_end: int = self.normalization_ROI[3]
-        
-            roi: np.ndarray = self.dark_image[y_start:y_end, x_start:x_end]
-            mean_value: float = np.mean(roi)
-            normalized_dark_image: np.ndarray = self.dark_image / mean_value
-            normalized_bright_image: np.ndarray = self.bright_image / mean_value
-            mask: np.ndarray = (normalized_dark_image != 0) & (normalized_bright_image != 0)
-            self.dark_image[self.dark_image == 0] = 1e-6
-            optical_density: np.ndarray = np.zeros_like(self.dark_image)
-            optical_density[mask] = np.log10(normalized_bright_image[mask] / normalized_dark_image[mask])
-            
-        else:
-            self.dark_image[self.dark_image == 0] = 1e-6
-            optical_density: np.ndarray = np.zeros_like(self.dark_image)
-            optical_density = np.log10(self.bright_image / self.dark_image)
-
-        
-
-        max_OD: float = np.amax(optical_density) 
-        optical_density[mask][optical_density[mask] == 0] = max_OD
+            mean_dark: float = np.mean(self.dark_image[y_start:y_end, x_start:x_end])
+            mean_bright: float = np.mean(self.bright_image[y_start:y_end, x_start:x_end])
+            offset = np.log10(mean_bright / mean_dark)
+        optical_density: np.ndarray = compute_od(self.dark_image, self.bright_image, offset)
 
         return optical_density
     
     def fit_cloud_profile_gaussian1D(self, OD: np.ndarray) -> tuple:
         # Fit 1D Gaussian profile of the cloud
-        def gaussian(x: np.ndarray, amplitude: float, mean: float, stddev: float) -> np.ndarray:
-            return amplitude * np.exp(-((x - mean) / stddev) ** 2 / 2)
-        
-        # Calculate uncertainties
-        def determine_uncertainty(popt: np.ndarray, pcov: np.ndarray, x: np.ndarray, OD_prof: np.ndarray) -> np.ndarray:
-            residuals: np.ndarray = OD_prof - gaussian(x, *popt)
-            OD_prof[OD_prof == 0] = 1e-6
-            chi_squared: float = np.sum((residuals / OD_prof) ** 2)
-            N: int = len(OD_prof)
-            num_params: int = len(popt)
-            dof: int = N - num_params
-            reduced_chi_squared: float = chi_squared / dof
-            parameter_variances: np.ndarray = np.diag(pcov)
-            return np.sqrt(parameter_variances)
-        
         roi_x_start: int = self.analys_ROI[0]
         roi_x_end: int = self.analys_ROI[1]
         roi_y_start: int = self.analys_ROI[2]
@@ -88,68 +235,90 @@ class AnalyseOD:
         #roi: np.ndarray = self.dark_image[y_start:y_end, x_start:x_end]
         roi_OD: np.ndarray = OD[roi_y_start:roi_y_end, roi_x_start:roi_x_end]
         gauss_1D = np.sum(roi_OD, axis=0)/np.shape(roi_OD)[0]
-        initial_guesses = (np.amax(gauss_1D), np.mean(gauss_1D), np.std(gauss_1D))
-        print(np.std(gauss_1D))
-        x = range(len(roi_OD[0]))
-        popt, pcov = curve_fit(gaussian, x, gauss_1D, p0=initial_guesses)
-        gauss_1D_fitted = gaussian(range(len(roi_OD[0])), *popt)
+        x: np.ndarray = np.arange(roi_OD.shape[1])
+        initial_guesses = (np.amax(gauss_1D), *profile_moments(x, gauss_1D))
+        popt, pcov = lm_fit(gaussian, jac_gaussian, x, gauss_1D, initial_guesses, self._fit_tol)
+        gauss_1D_fitted = gaussian(x, *popt)
 
-        parameters_uncertainty = determine_uncertainty(popt=popt, pcov=pcov,x=x, OD_prof=gauss_1D)
+        # Calculate uncertainties
+        parameters_uncertainty: np.ndarray = np.sqrt(np.diag(pcov))
         return gauss_1D, gauss_1D_fitted, popt, parameters_uncertainty
         
 
         
      
+    def fit_cloud_profile_moments(self, OD: np.ndarray) -> tuple:
+        # Closed-form estimate of the cloud parameters (amplitude, x0, y0, sigma_x, sigma_y) from
+        # the first two moments of the ROI profiles along x and y. Much faster than the gaussian
+        # fits, enough to monitor the cloud, and used as their initial guess
+        roi_x_start: int = self.analys_ROI[0]
+        roi_x_end: int = self.analys_ROI[1]
+        roi_y_start: int = self.analys_ROI[2]
+        roi_y_end: int = self.analys_ROI[3]
+        roi_OD: np.ndarray = OD[roi_y_start:roi_y_end, roi_x_start:roi_x_end]
+        X, Y = open_grid(roi_x_start, roi_x_end, roi_y_start, roi_y_end)
+        x0, sigma_x = profile_moments(X.ravel(), roi_OD.sum(axis=0))
+        y0, sigma_y = profile_moments(Y.ravel(), roi_OD.sum(axis=1))
+        return np.max(roi_OD), x0, y0, sigma_x, sigma_y
+
     def fit_cloud_profile_gaussian2D(self, OD: np.ndarray) -> tuple:
         # Fit 2D Gaussian profile of the cloud
-        def gaussian_2d(xy: tuple, amplitude: float, xo: float, yo: float, sigma_x: float, sigma_y: float, theta: float) -> np.ndarray:
-            x, y = xy
-            xo = float(xo)
-            yo = float(yo)
-            a = (np.cos(theta)**2) / (2 * sigma_x**2) + (np.sin(theta)**2) / (2 * sigma_y**2)
-            b = -(np.sin(2 * theta)) / (4 * sigma_x**2) + (np.sin(2 * theta)) / (4 * sigma_y**2)
-            c = (np.sin(theta)**2) / (2 * sigma_x**2) + (np.cos(theta)**2) / (2 * sigma_y**2)
-            g = amplitude * np.exp(- (a * ((x - xo)**2) + 2 * b * (x - xo) * (y - yo) + c * ((y - yo)**2)))
-            return g.ravel()
-        
         roi_x_start: int = self.analys_ROI[0]
         roi_x_end: int = self.analys_ROI[1]
         roi_y_start: int = self.analys_ROI[2]
         roi_y_end: int = self.analys_ROI[3]
-        roi_OD: np.ndarray = OD[roi_y_end:roi_y_start, roi_x_start:roi_x_end]
+        roi_OD: np.ndarray = OD[roi_y_start:roi_y_end, roi_x_start:roi_x_end]
 
-        # Grid for the image 
-        x: np.ndarray = np.arange(OD.shape[1])
-        y: np.ndarray = np.arange(OD.shape[0])
-        X, Y = np.meshgrid(x, y)
+        # Open grid of the ROI only, the rest of the image is not fitted
+        X, Y = open_grid(roi_x_start, roi_x_end, roi_y_start, roi_y_end)
 
         # Calculate the number of atoms in the ROI of analysis 
         cross_section: float = 2.907e-13   # [m^2]
         density: np.ndarray = roi_OD / cross_section
         number_atoms: float = np.sum(density * (8.46e-6)**2)
 
-        # Initial guess for the fit
-        initial_guess: tuple = (np.max(OD), OD.shape[1] / 2, OD.shape[0] / 2, 400, 400, 0)
+        # Initial guess for the fit from the moments of the cloud, not rotated
+        initial_guess: tuple = (*self.fit_cloud_profile_moments(OD), 0)
         
-        # Curve fitting
-        popt, pcov = curve_fit(gaussian_2d, (X, Y), OD.ravel(), p0=initial_guess)
+        # Curve fitting, first of an axis-aligned gaussian whose model is separable: theta is
+        # left out of the fitted parameters and keeps its default value of 0
+        roi_data: np.ndarray = roi_OD.ravel()
+        popt, pcov = lm_fit(gaussian_2d, jac_gaussian_2d, (X, Y), roi_data, initial_guess[:5], self._fit_tol)
+        popt = np.append(popt, 0.)
+        pcov = np.pad(pcov, ((0, 1), (0, 1)))
+        fitted_roi: np.ndarray = gaussian_2d((X, Y), *popt)
+
+        # The rotation is only fitted if releasing it is expected to lower the chi-squared
+        # significantly (one Gauss-Newton step on theta). The derivative along theta vanishes for
+        # a round cloud (sigma_x == sigma_y), which has no rotation to fit
+        residuals: np.ndarray = roi_data - fitted_roi
+        jac_theta: np.ndarray = jac_gaussian_2d((X, Y), *popt)[:, 5]
+        jac_theta_norm2: float = np.dot(jac_theta, jac_theta)
+        if jac_theta_norm2 > 0 and (np.dot(jac_theta, residuals)**2 / jac_theta_norm2
+                                    > self._rotation_chi2_rtol * np.dot(residuals, residuals)):
+            popt, pcov = lm_fit(gaussian_2d, jac_gaussian_2d, (X, Y), roi_data, popt, self._fit_tol)
+            fitted_roi = gaussian_2d((X, Y), *popt)
         
-        # Fitted profile
-        fitted_profile: np.ndarray = gaussian_2d((X, Y), *popt).reshape(OD.shape)
+        # Fitted profile, embedded in a full size image
+        fitted_profile: np.ndarray = np.zeros_like(OD)
+        fitted_profile[roi_y_start:roi_y_end, roi_x_start:roi_x_end] = fitted_roi.reshape(roi_OD.shape)
 
         # Calculate uncertainties
-        residuals: np.ndarray = OD.ravel() - gaussian_2d((X, Y), *popt)
-        OD[OD == 0] = 1e-6
-        chi_squared: float = np.sum((residuals / OD.ravel()) ** 2)
-        N: int = len(OD.ravel())
-        num_params: int = len(popt)
-        dof: int = N - num_params
-        reduced_chi_squared: float = chi_squared / dof
-        parameter_variances: np.ndarray = np.diag(pcov)
-        parameters_uncertainty: np.ndarray = np.sqrt(parameter_variances)
+        parameters_uncertainty: np.ndarray = np.sqrt(np.diag(pcov))
         
         return number_atoms, fitted_profile, parameters_uncertainty
 
 
+def process_pair(dark: np.ndarray, bright: np.ndarray, analys_ROI: list, normalization_ROI: list = None) -> tuple:
+    # Optical density and 2D fit of one (dark, bright) pair
+    analysis = AnalyseOD(images=[dark, bright], analys_ROI=analys_ROI, normalization_ROI=normalization_ROI)
+    OD: np.ndarray = analysis.calculate_OD()
+    number_atoms, fitted_profile, parameters_uncertainty = analysis.fit_cloud_profile_gaussian2D(OD)
+    return OD, number_atoms, fitted_profile, parameters_uncertainty
 
 
+def process_pairs(images: list, analys_ROI: list, normalization_ROI: list = None, n_jobs: int = -1) -> list:
+    # Runs process_pair on the consecutive (dark, bright) frames of an acquisition, the pairs
+    # being independent they are spread over n_jobs worker processes
+    pairs = zip(images[0::2], images[1::2])
+    return Parallel(n_jobs=n_jobs)(delayed(process_pair)(dark, bright, analys_ROI, normalization_ROI) for dark, bright in pairs)
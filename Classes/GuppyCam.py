@@ -7,6 +7,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import cv2
 import threading
+from contextlib import ExitStack
 
 import logging
 import time
@@ -126,22 +127,31 @@ class GuppyPro():
         """
         self.vimba = vimba
         self.camera = self.vimba.openCamera(detection_number)
+        # The camera is kept open for the lifetime of the object: opening it is a handshake of
+        # tens of ms that would otherwise be paid by every getter and setter
+        self._exit_stack = ExitStack()
+        self.cam = self._exit_stack.enter_context(self.camera)
         self.stopAcquisition = threading.Event()
         self.imagesAcquired = threading.Event()
         
+    def close(self) -> None:
+        """Closes the camera opened at instantiation.
+        """
+        logging.info("GuppyCam    : Closing camera")
+        self._exit_stack.close()
+        
     def getCameraSettings(self) -> dict:
         """Retrieves the settings of the Guppy camera.
         Returns:
             settings: dictionary of settings containing "ExposureTime", "Gain", "AcquisitionMode", "TriggerSource" and "TriggerMode" values.
         """
         res = dict()
-        with self.camera as cam:
-            logging.info("GuppyCam    : Updating current camera information")
-            res["ExposureTime"] = cam.ExposureTime.get()
-            res["Gain"] = cam.Gain.get()
-            res["AcquisitionMode"] = cam.AcquisitionMode.get().as_tuple()[0]
-            res["TriggerSource"] = cam.TriggerSource.get().as_tuple()[0]
-            res["TriggerMode"] = cam.TriggerMode.get().as_tuple()[0]
+        logging.info("GuppyCam    : Updating current camera information")
+        res["ExposureTime"] = self.cam.ExposureTime.get()
+        res["Gain"] = self.cam.Gain.get()
+        res["AcquisitionMode"] = self.cam.AcquisitionMode.get().as_tuple()[0]
+        res["TriggerSource"] = self.cam.TriggerSource.get().as_tuple()[0]
+        res["TriggerMode"] = self.cam.TriggerMode.get().as_tuple()[0]
         return res
     
     def changeCameraSettings(self, settings: dict) -> None:
@@ -149,13 +159,12 @@ class GuppyPro():
         Args:
             settings (dict): dictionary of settings containing "ExposureTime", "Gain", "AcquisitionMode" and "TriggerSource" values.
         """
-        with self.camera as cam:
-            logging.info("GuppyCam    : Changing camera settings")
-            cam.ExposureTime.set(settings["ExposureTime"])
-            cam.Gain.set(settings["Gain"])
-            cam.AcquisitionMode.set(settings["AcquisitionMode"])
-            cam.TriggerSource.set(settings["TriggerSource"])
-            cam.TriggerMode.set(settings["TriggerMode"])
+        logging.info("GuppyCam    : Changing camera settings")
+        self.cam.ExposureTime.set(settings["ExposureTime"])
+        self.cam.Gain.set(settings["Gain"])
+        self.cam.AcquisitionMode.set(settings["AcquisitionMode"])
+        self.cam.TriggerSource.set(settings["TriggerSource"])
+        self.cam.TriggerMode.set(settings["TriggerMode"])
     
     def setExposureTime(self, exposure_time: float) -> None:
         """
@@ -163,18 +172,16 @@ class GuppyPro():
         Args:
             exposure_time (float) : new exposure time in µs
         """
-        with self.camera as cam:
-            logging.info(f"GuppyCam    : Changing exposure time to {exposure_time:.0f}")
-            cam.ExposureTime.set(exposure_time)                  # changing on the camera
+        logging.info(f"GuppyCam    : Changing exposure time to {exposure_time:.0f}")
+        self.cam.ExposureTime.set(exposure_time)                 # changing on the camera
             
     def getExposureTime(self) ->  float:
         """Gets value of exposure time of the camera.
         Returns:
             float: exposure time of the camera (in µs)
         """
-        with self.camera as cam:
-            logging.info(f"GuppyCam    : Retrieving exposure time from camera")
-            return cam.ExposureTime.get()
+        logging.info(f"GuppyCam    : Retrieving exposure time from camera")
+        return self.cam.ExposureTime.get()
     
     def takePicture(self) -> Frame:
         """Manually trigger the camera and retrieve a picture.
@@ -189,26 +196,26 @@ class GuppyPro():
             cam.queue_frame(frame)  # Resetting the queue frame seems to be the best practice
             self.stopAcquisition.set()
             
-        with self.camera as cam:
-            cam.TriggerSource.set("Software")
-            cam.start_streaming(handler_single)
-            cam.TriggerSoftware.run()
-            self.stopAcquisition.wait()
-            logging.info("GuppyCam    : Frame taken. Closing camera")
-            self.stopAcquisition.clear()
-            return self.res
+        self.cam.TriggerSource.set("Software")
+        self.cam.start_streaming(handler_single)
+        self.cam.TriggerSoftware.run()
+        self.stopAcquisition.wait()
+        self.cam.stop_streaming()   # the camera stays open, so streaming is stopped explicitly
+        logging.info("GuppyCam    : Frame taken")
+        self.stopAcquisition.clear()
+        return self.res
     
-    def startAcquisition(self, N_IMAGES: int = 1, TIMEOUT: float = None, BUFFER_COUNT: int = 5) -> list:
-        """Starts acquisition of the camera,  and returns the images captured as a list.
+    def startAcquisition(self, N_IMAGES: int = 1, TIMEOUT: float = None, BUFFER_COUNT: int = 5) -> np.ndarray:
+        """Starts acquisition of the camera,  and returns the images captured as a stacked array.
         Args:
             N_IMAGES (int, optional): Number of images to capture. Defaults to 1.
             TIMEOUT (float, optional): Delay (in s) before a TimeoutError is raised. Defaults to None (no timeout).
             BUFFER_COUNT (int, optional): Number of buffers to pass to the camera. 5 is largely enough in our case. Defaults to 5.
         Returns:
-            res: list of the frames that were taken.
+            out: (N, H, W) array of the N frames that were taken, in the native dtype of the camera.
         """
-        res = list()                # list of Frame objects
-        self.n_images = 0           # number of images taken
+        res = [None] * N_IMAGES     # preallocated list of Frame objects, filled by the handler
+        self.n_images = 0           # number of images taken, index of the next slot of res
         self.stopAcquisition.clear()
         self.imagesAcquired.clear()
         
@@ -217,28 +224,38 @@ class GuppyPro():
             Function that is called after each acquisition of a frame.
             """
             logging.info("GuppyCam    : Handling frame")
-            self.n_images += 1
-            res.append(frame)
-            if self.n_images == N_IMAGES:
-                self.stopAcquisition.set()
+            idx = self.n_images
+            if idx < N_IMAGES:      # frames arriving after the last slot is filled are dropped
+                res[idx] = frame
+                self.n_images = idx + 1
+                if self.n_images == N_IMAGES:
+                    self.stopAcquisition.set()
             cam.queue_frame(frame)  # Resetting the queue frame
         
-        with self.camera as cam:
-            logging.info("GuppyCam    : Starting acquisition")
-            cam.TriggerSource.set("InputLines")
-            cam.TriggerMode.set("On")
-            cam.start_streaming(handler, buffer_count=BUFFER_COUNT)
-            self.stopAcquisition.wait(timeout=TIMEOUT)
-            self.stopAcquisition.set()
-            logging.info("GuppyCam    : Stopping acquisition")
-            if self.n_images == 0:
-                pass
-                # raise TimeoutError("No trigger detected on camera during capture window !")
-            else:
-                self.imagesAcquired.set()
-                self.stopAcquisition.clear()
-                logging.info(f"GuppyCam    : {len(res)} images acquired !")
-                return [np.array(im.as_opencv_image().transpose()[0, :, :]) for im in res] # Changing the frame format for easier handling later
+        logging.info("GuppyCam    : Starting acquisition")
+        self.cam.TriggerSource.set("InputLines")
+        self.cam.TriggerMode.set("On")
+        self.cam.start_streaming(handler, buffer_count=BUFFER_COUNT)
+        # Blocking wait: threading.Event.wait releases the GIL, so the other threads keep running
+        # while the frames are delivered to the handler
+        self.stopAcquisition.wait(timeout=TIMEOUT)
+        self.stopAcquisition.set()
+        logging.info("GuppyCam    : Stopping acquisition")
+        self.cam.stop_streaming()   # the camera stays open, so streaming is stopped explicitly
+        if self.n_images == 0:
+            pass
+            # raise TimeoutError("No trigger detected on camera during capture window !")
+        else:
+            self.imagesAcquired.set()
+            self.stopAcquisition.clear()
+            logging.info(f"GuppyCam    : {self.n_images} images acquired !")
+            # Single allocation for all the frames, each mono plane copied out of its frame buffer.
+            # The frames keep the native dtype of the camera, the OD kernels promote them per pixel
+            first = res[0].as_opencv_image()
+            out = np.empty((self.n_images, *first.shape[:2]), dtype=first.dtype)
+            for i, frame in enumerate(res[:self.n_images]):
+                np.copyto(out[i], frame.as_opencv_image()[..., 0])
+            return out
 
 # ############################################################################
 # ####                                                                    ####
@@ -7,12 +7,55 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 import numpy as np
 import logging
+import math
+import queue
 import threading
+from numba import njit, prange
+try:
+    import cupy as cp
+    # CuPy may be installed without a usable device or driver, in which case it fails on first use
+    if not cp.cuda.is_available():
+        cp = None
+except Exception:       # optional, the OD and colormap of the acquisitions then run on the CPU
+    cp = None
 
 logging.basicConfig(level=logging.DEBUG)
+pg.setConfigOptions(imageAxisOrder='row-major') # frames are (H, W) arrays, as returned by the camera
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _od_kernel(ref, abs_, out):
+    """Writes log10(ref / abs_) into out in a single pass over the images, 0 where ref or abs_ is 0,
+    so that the OD stays finite (fastmath assumes no infinities).
+    The frames are read in their native (integer) type and promoted to float32 pixel by pixel.
+    log10 is taken as log2 times log10(2), cheaper and vectorizable with fastmath.
+    """
+    for i in prange(ref.shape[0]):
+        for j in range(ref.shape[1]):
+            r = np.float32(ref[i, j])
+            a = np.float32(abs_[i, j])
+            out[i, j] = math.log2(r / a) * 0.30102999566398114 if a != 0 and r != 0 else 0.0
+
+
+if cp is not None:
+    # GPU counterpart of _od_kernel followed by apply_colormap: OD, index in the lookup table and
+    # gather of the RGBA value, packed as uint32, in a single elementwise pass. The OD is written
+    # out as well, for the cuts of the crosshair
+    _od_lut_kernel = cp.ElementwiseKernel(
+        'T ref, T abs_, raw uint32 lut, float32 lo, float32 scale',
+        'float32 od, uint32 out',
+        """
+        od = abs_ != 0 && ref != 0 ? log10f((float)ref / (float)abs_) : 0.f;
+        int k = __float2int_rz((od - lo) * scale);
+        out = lut[min(max(k, 0), 255)];
+        """,
+        'od_lut')
 
 
 class MainWindow(QMainWindow):
+    # Colormaps sampled as (256, 4) uint8 RGBA lookup tables, keyed by name and built on first use
+    _CMAP_CACHE: dict = {}
+    
     def __init__(self):
         """
         Initiates the Ui_MainWindow() class, and gets the Ui_MainWindow() instance.
@@ -41,15 +84,31 @@ class MainWindow(QMainWindow):
         self.same_exposure_than_before = None
         self.trig_mode = None
         
-        # May be temporary... who knows ?
-        self.firstImage = True
+        # Single ImageItem of the main view, created with the first frame and updated in place
+        self.image_item = None
+        # Pixmap item of the main view for the colored frames, created with the first one
+        self._pixmap_item = None
+        # Frame buffers (OD, colormap, cuts), allocated by _ensure_buffers with the first frame and
+        # reused as long as the frame shape is the same
+        self._buf_shape = None
+        # Native dtype of the camera frames, set with the first frame
+        self._frame_dtype = None
+        # GPU buffers of colorize_OD, allocated with the first frame if CuPy is available. The GPU
+        # path is checked against the CPU one on the first frame, and dropped if it differs or fails
+        self._use_gpu = cp is not None
+        self._gpu_checked = False
+        self._gpu_key = None
+        self._gpu_luts = {}
         
         self.main_view = self.ui.widgetFrame.addViewBox()
+        # The range is set to the frame by show_image, instead of recomputed at each update
+        self.main_view.disableAutoRange()
         
         self.resizeEvent = self.on_resize   # used to make the display of widgetFrame always square 
         self.crosshair_h = None
         self.crosshair_v = None
         self.crosshair_enabled = False
+        self.od_image = None    # OD of the displayed frame, read by the cuts of the crosshair
         
         # parametrize plot widgets
         self.main_view.scene().sigMouseClicked.connect(self.mouse_click_event)
@@ -57,6 +116,16 @@ class MainWindow(QMainWindow):
         self.ui.widget_Vcut.plotItem.hideAxis('left')
         self.ui.widget_Hcut.plotItem.hideAxis('bottom')
         self.ui.widget_Hcut.plotItem.hideAxis('left')
+        # Curves of the cuts, created once and updated with setData
+        self._hcut_curve = self.ui.widget_Hcut.plot()
+        self._vcut_curve = self.ui.widget_Vcut.plot()
+        
+        # The display is refreshed at most every 33 ms (30 Hz) with the latest frame, whatever
+        # the acquisition rate: refreshImage only stores the frame and flags it as new
+        self._new_frame = False
+        self._ui_timer = QTimer()
+        self._ui_timer.timeout.connect(self._refresh_ui)
+        self._ui_timer.start(33)
         # __________________________________________________________________________
         # connect buttons with methods
         # __________________________________________________________________________
@@ -97,8 +166,6 @@ class MainWindow(QMainWindow):
         take a picture with 'snap' mode
         :return:None
         """
-        self.main_view.clear()
-
         current_exposure_time = float(self.ui.doubleSpinBox_exposure.value())
         current_trig_mode = 'int'
 
@@ -121,18 +188,15 @@ class MainWindow(QMainWindow):
         # Display image
         if self.roi_norm is not None:
             normalized_image_data = self.image_data / self.roi_norm_mean
-            self.image_item = pg.ImageItem(image=normalized_image_data)
+            self.show_image(normalized_image_data)
         else:
-            self.image_item = pg.ImageItem(image=self.image_data)
-        self.main_view.addItem(self.image_item)
+            self.show_image(self.image_data)
         # if there is a crosshair:
         if self.crosshair_enabled is True:
             self.plot_crosshair()
         
         self._number_frame += 1
-        self.ui.textBrowserLogs.clear()
-        self.ui.textBrowserLogs.append(
-            "Frame number : "+str(self._number_frame))
+        self._log_frame_number()
 
     def display_image_ext(self):
         """
@@ -161,21 +225,25 @@ class MainWindow(QMainWindow):
         # Display image
         if self.roi_norm is not None:
             self.image_data = self.image_data / self.roi_norm_mean
-            self.image_item = pg.ImageItem(image=self.image_data)
-        else:
-            self.image_item = pg.ImageItem(image=self.image_data)
+        self.show_image(self.image_data)
 
-        self.main_view.addItem(self.image_item)
         self._number_frame += 1
-        # self.ui.textBrowserLogs.clear()
-        self.ui.textBrowserLogs.append(
-            "Frame number : "+str(self._number_frame))
+        self._log_frame_number()
         if self.acquistion is True:
             self.acquisition_data.append(self.image_data)
         if self.crosshair_enabled is True:
             self.plot_crosshair()
     
     
+    def _log_frame_number(self):
+        """
+        Shows the frame number in the logs every 30 frames: relayouting the text browser at
+        each frame takes a sizeable share of the UI time.
+        """
+        if self._number_frame % 30 == 0:
+            self.ui.textBrowserLogs.setPlainText("Frame number : "+str(self._number_frame))
+    
+    
     ############################################################################
     ####                                                                    ####
     ####                            DISPLAY                                 ####
@@ -183,28 +251,157 @@ class MainWindow(QMainWindow):
     ############################################################################
 
     
-    def calculate_OD(self, imageref, imageabs):
+    def calculate_OD(self, imageref, imageabs, out = None):
         """ 
         Calculates OD, where imageref is the reference and imageabs the absorption.
+        The OD is written in out, by default self._od_buf which is overwritten by the next call.
+        """
+        if out is None:
+            self._ensure_buffers(imageref.shape)
+            out = self._od_buf
+        # The kernel is compiled for the dtype of the first frames, the camera must keep it
+        if self._frame_dtype is None:
+            self._frame_dtype = imageref.dtype
+        assert imageref.dtype == imageabs.dtype == self._frame_dtype, \
+            f"Frames of dtype {imageref.dtype} and {imageabs.dtype}, expected {self._frame_dtype}"
+        _od_kernel(imageref, imageabs, out)
+        return out
+
+    @classmethod
+    def _colormap_lut(cls, cmap_name):
+        """Samples a matplotlib colormap as a (256, 4) uint8 RGBA table, opaque, once per colormap.
+        RGBA frames go through pyqtgraph to a QImage without being expanded from RGB.
         """
-        div = np.divide(imageref, imageabs, out=np.ones_like(imageref, dtype=np.float64), where=imageabs!=0)
-        return np.log10(div)
+        if cmap_name not in cls._CMAP_CACHE:
+            lut = (plt.get_cmap(cmap_name)(np.linspace(0, 1, 256)) * 255).astype(np.uint8)
+            lut[:, 3] = 255
+            cls._CMAP_CACHE[cmap_name] = lut
+        return cls._CMAP_CACHE[cmap_name]
 
-    def apply_colormap(self, image, cmap_name = 'plasma', boundaries = [0, 256]) -> np.uint8:
+    def apply_colormap(self, image, cmap_name = 'plasma', boundaries = [0., 1.], out = None, scratch = None) -> np.uint8:
         """Applies specified colormap to the image passed as an argument.
 
         Args:
             image (_type_): Numpy array of floats
             cmap (str, optional): Name of the chosen matplotlib colormap. Defaults to 'plasma'.
-            boundaries (list, optional): Minimum and maximum values. Defaults to [0., 1.]. Not yet implemented
+            boundaries (list, optional): Minimum and maximum values, mapped to both ends of the colormap. Defaults to [0., 1.].
+            out (np.ndarray, optional): (H, W, 4) uint8 array the colored image is written in. Defaults to self._rgba_buf.
+            scratch (tuple, optional): (H, W) float32 and uint8 arrays for the scaled image and the lookup table indices. Defaults to self._scaled_buf and self._idx_buf.
             
         """
-        cm = plt.get_cmap(cmap_name)
-        colored_image = cm(image)
-        return (colored_image[:, :, :3] * 255).astype(np.uint8) # Converting to array of 0-255 RGB values
+        if out is None or scratch is None:
+            self._ensure_buffers(image.shape)
+        out = self._rgba_buf if out is None else out
+        scaled_buf, idx_buf = (self._scaled_buf, self._idx_buf) if scratch is None else scratch
+        lo, hi = boundaries
+        # Index of each pixel in the lookup table, then a single gather to 0-255 RGBA values.
+        # The result is written in out, self._rgba_buf by default which is overwritten by the next call
+        scaled = np.clip(image, lo, hi, out=scaled_buf)
+        scaled -= lo
+        scaled *= 255.0 / (hi - lo)
+        np.copyto(idx_buf, scaled, casting='unsafe')
+        return np.take(self._colormap_lut(cmap_name), idx_buf, axis=0, out=out)
+    
+    def colorize_OD(self, imageref, imageabs, od, out, scratch, cmap_name = 'plasma', boundaries = [0., 1.]) -> np.uint8:
+        """
+        Calculates the OD of the frames, written in od, a (H, W) float32 array, and applies the
+        colormap to it, written in out, a (H, W, 4) uint8 array. Runs as a single kernel on the GPU
+        if CuPy is available, with the frames copied to preallocated device buffers, and with
+        calculate_OD and apply_colormap otherwise, in the scratch arrays (scaled image, table
+        indices) of the caller. Called by the Worker, it leaves the buffers of the main thread
+        untouched. If the GPU fails, or differs from the CPU on the first frame, the CPU takes over.
+        """
+        if self._use_gpu:
+            try:
+                self._colorize_OD_gpu(imageref, imageabs, od, out, cmap_name, boundaries)
+                if not self._gpu_checked:
+                    self._check_gpu(imageref, imageabs, od, out, cmap_name, boundaries)
+                if self._use_gpu:
+                    return out
+            except Exception as e:
+                logging.warning(f"GPU coloring failed ({e}), falling back to the CPU")
+                self._use_gpu = False
+        self.calculate_OD(imageref, imageabs, out=od)
+        return self.apply_colormap(od, cmap_name, boundaries, out, scratch=scratch)
+
+    def _colorize_OD_gpu(self, imageref, imageabs, od, out, cmap_name, boundaries) -> None:
+        """GPU path of colorize_OD, a single CuPy kernel writing both the OD and the colored image.
+        """
+        key = (imageref.shape, imageref.dtype)
+        if key != self._gpu_key:
+            self._gpu_ref = cp.empty(imageref.shape, dtype=imageref.dtype)
+            self._gpu_abs = cp.empty(imageref.shape, dtype=imageref.dtype)
+            self._gpu_od = cp.empty(imageref.shape, dtype=cp.float32)
+            self._gpu_rgba = cp.empty(imageref.shape, dtype=cp.uint32)
+            self._gpu_key = key
+        if cmap_name not in self._gpu_luts:
+            self._gpu_luts[cmap_name] = cp.asarray(self._colormap_lut(cmap_name).view(np.uint32).ravel())
+        lo, hi = boundaries
+        self._gpu_ref.set(imageref)
+        self._gpu_abs.set(imageabs)
+        _od_lut_kernel(self._gpu_ref, self._gpu_abs, self._gpu_luts[cmap_name],
+                       np.float32(lo), np.float32(255.0 / (hi - lo)), self._gpu_od, self._gpu_rgba)
+        self._gpu_od.get(out=od)
+        # Each RGBA pixel of out seen as one uint32, as packed by the kernel
+        self._gpu_rgba.get(out=out.view(np.uint32).reshape(out.shape[:2]))
+
+    def _check_gpu(self, imageref, imageabs, od, out, cmap_name, boundaries) -> None:
+        """Compares the OD and colored image of a frame computed on the GPU with the CPU path, run in
+        temporary arrays, and disables the GPU path if they differ. The colors are compared on the
+        OD of the GPU, as log10 and its log2 form may differ by an ulp at the edge of a color bin.
+        """
+        self._gpu_checked = True
+        od_cpu = self.calculate_OD(imageref, imageabs, out=np.empty_like(od))
+        rgba_cpu = self.apply_colormap(od, cmap_name, boundaries, out=np.empty_like(out),
+                                       scratch=(np.empty_like(od), np.empty(od.shape, dtype=np.uint8)))
+        if not (np.allclose(od, od_cpu, rtol=1e-5, atol=1e-6) and np.array_equal(out, rgba_cpu)):
+            logging.warning("OD or colors computed on the GPU differ from the CPU ones, falling back to the CPU")
+            self._use_gpu = False
+
+    def _ensure_buffers(self, shape) -> None:
+        """(Re)allocates the frame buffers if the frame shape is not the one they were allocated for.
+        """
+        if shape == self._buf_shape:
+            return
+        H, W = shape[:2]
+        self._od_buf = np.empty((H, W), dtype=np.float32)       # OD of the frame
+        self._scaled_buf = np.empty((H, W), dtype=np.float32)   # image scaled to the colormap range
+        self._idx_buf = np.empty((H, W), dtype=np.uint8)        # indices in the colormap lookup table
+        self._rgba_buf = np.empty((H, W, 4), dtype=np.uint8)    # colored image
+        self._norm_buf = np.empty((H, W), dtype=np.float32)     # image normalized by the ROI mean
+        self._hcut_buf = np.empty(W, dtype=np.float32)          # horizontal cut of the crosshair
+        self._vcut_buf = np.empty(H, dtype=np.float32)          # vertical cut of the crosshair
+        self._yvals = np.arange(H)                              # abscissa of the vertical cut
+        self._buf_shape = shape
+
+    def show_image(self, image, **kwargs) -> None:
+        """Shows image in the main view. The ImageItem is created and its levels set on the first
+        frame, the following frames are uploaded to it in place with the same levels.
+        Keyword arguments are passed to ImageItem.setImage, e.g. levels=None to display uint8
+        RGBA values as they are.
+        """
+        if self.image_item is None:
+            self.image_item = pg.ImageItem(image=image, **kwargs)
+            self.main_view.addItem(self.image_item)
+            self.main_view.setRange(QRectF(0, 0, image.shape[1], image.shape[0]), padding=0)
+        else:
+            kwargs.setdefault('autoLevels', False)
+            self.image_item.setImage(image, **kwargs)
+    
+    def show_rgba(self, rgba) -> None:
+        """Shows a (H, W, 4) uint8 RGBA frame in the main view. The array is wrapped in a QImage
+        without copy and converted once to a pixmap, bypassing the pyqtgraph conversions.
+        """
+        H, W = rgba.shape[:2]
+        qimage = QImage(rgba.data, W, H, 4 * W, QImage.Format_RGBA8888)
+        if self._pixmap_item is None:
+            self._pixmap_item = QGraphicsPixmapItem()
+            self.main_view.addItem(self._pixmap_item)
+            self.main_view.setRange(QRectF(0, 0, W, H), padding=0)
+        self._pixmap_item.setPixmap(QPixmap.fromImage(qimage))
     
     def refreshImage(self) -> None:
-        """Shows the image stored in self.current_images.
+        """Colors the image stored in self.current_images, shown by the next _refresh_ui.
         """
         # try:
         logging.info("UI : Refreshing image")
@@ -212,18 +409,24 @@ class MainWindow(QMainWindow):
             self.od_image = self.calculate_OD(self.current_images[1], self.current_images[0])
             print(np.shape(self.od_image))
             self.colored_od = self.apply_colormap(self.od_image)
-            if self.firstImage:
-                self.image_item = pg.ImageItem(image=self.colored_od)
-                self.main_view.addItem(self.image_item)
-                self.firstImage = False
-            else:
-                self.image_item.setImage(image = self.colored_od)
+            self._new_frame = True
         # except ValueError:
         #     pass
         # except IndexError:
         #     self.image_item = pg.ImageItem(image=self.apply_colormap(self.current_images[0]))
         #     self.main_view.addItem(self.image_item)
         
+    def _refresh_ui(self) -> None:
+        """Pushes the latest colored frame, and the cuts if the crosshair is enabled, to the
+        pyqtgraph items. Called by self._ui_timer, frames colored in between are dropped.
+        """
+        if not self._new_frame:
+            return
+        self._new_frame = False
+        self.show_rgba(self.colored_od)
+        if self.crosshair_enabled is True:
+            self._update_cuts()
+        
     ############################################################################
     ####                                                                    ####
     ####                            CAMERA                                  ####
@@ -237,6 +440,14 @@ class MainWindow(QMainWindow):
         self.camera.setExposureTime(newval * 1e3) # setting the new exp time (in µs)
         logging.info("UI : Changing exposure time")
         
+    def closeEvent(self, event):
+        """Closes the camera, kept open by GuppyPro, when the window is closed. The acquisition
+        and the Worker are stopped first, so that no streaming runs on the closed camera.
+        """
+        self.stop_acquisition()
+        self.camera.close()
+        super().closeEvent(event)
+        
     
     ############################################################################
     ####                                                                    ####
@@ -246,15 +457,24 @@ class MainWindow(QMainWindow):
     
     def _acquire_images(self, N_IMAGES = 2):
         """
-        To be called by the Worker thread.
+        To be called by the Worker thread. The frames are returned, colored by the Worker and
+        displayed by _on_frame in the main thread.
+        """
+        return self.camera.startAcquisition(N_IMAGES=N_IMAGES)
+    
+    def _on_frame(self):
+        """
+        Slot of the Worker frameReady signal, runs in the main thread. Takes the oldest (OD, colored)
+        frame pair queued by the Worker, which is put once per signal, shown by the next _refresh_ui.
         """
-        img = self.camera.startAcquisition(N_IMAGES=N_IMAGES)
-        if img is not None:
-            self.current_images = img
-            self._number_frame += 1
-            self.refreshImage()
-            # self.stop_acquisition() if
-        return
+        try:
+            od, rgba = self.worker_thread.frames.get_nowait()
+        except queue.Empty:
+            return
+        self.od_image = od
+        self.colored_od = rgba
+        self._number_frame += 1
+        self._new_frame = True
     
     
     def start_thread(self):
@@ -263,10 +483,13 @@ class MainWindow(QMainWindow):
         :return: None
         """
         self.worker_thread = Worker(self)
+        self.worker_thread.frameReady.connect(self._on_frame)
         logging.info("Main : Starting thread Worker")
         self.worker_thread.start()
         self._number_frame = 0
         self.main_view.clear()
+        self.image_item = None  # removed from the view, created again with the next frame
+        self._pixmap_item = None
 
     def stop_thread(self):
         """
@@ -274,9 +497,8 @@ class MainWindow(QMainWindow):
         :return: None
         """
         if self.worker_thread is not None and self.worker_thread.isRunning():
-            self.worker_thread.requestInterruption()
+            self.worker_thread.requestStop.set()
             logging.info("Main : Stopping thread Worker")
-            #self.worker_thread.requestStop = True
             self.worker_thread.wait(1000)
             self.worker_thread.quit()
             self._number_frame = 0
@@ -326,19 +548,24 @@ class MainWindow(QMainWindow):
         """
         self.roi_norm_pos = self.roi_norm.pos()
         self.roi_norm_size = self.roi_norm.size()
-        # Extract the region within the ROI
-        x, y, w, h = self.roi_norm_pos[0], self.roi_norm_pos[1], self.roi_norm_size[0], self.roi_norm_size[1]
-        self.roi_norm_data = self.image_data[int(
-            y):int(y + h), int(x):int(x + w)]
-
-        # Calculate the mean of all points within the ROI
-        self.roi_norm_mean = np.mean(self.roi_norm_data)
-
-        # Divide the entire image by the mean of the ROI
-        normalized_image_data = self.image_data / self.roi_norm_mean
+        # Extract the region within the ROI, as a view
+        x, y, w, h = (int(v) for v in (self.roi_norm_pos[0], self.roi_norm_pos[1], self.roi_norm_size[0], self.roi_norm_size[1]))
+        x, y = max(x, 0), max(y, 0)     # negative bounds would wrap around the frame
+        self.roi_norm_data = self.image_data[y:y + h, x:x + w]
+        if self.roi_norm_data.size == 0:
+            logging.warning("Normalization ROI outside of the frame, the image is not normalized")
+            return
+
+        # Calculate the mean of all points within the ROI, in a single pass
+        self.roi_norm_mean = np.add.reduce(self.roi_norm_data, axis=None) * (1.0 / self.roi_norm_data.size)
+
+        # Divide the entire image by the mean of the ROI, as a multiplication into its own buffer,
+        # which stays on screen: the frame buffers are overwritten by the next acquisition
+        inv_mean = 1.0 / self.roi_norm_mean
+        self._ensure_buffers(self.image_data.shape)
+        normalized_image_data = np.multiply(self.image_data, inv_mean, out=self._norm_buf)
         # Update the image item with the normalized data
-        self.image_item = pg.ImageItem(image=normalized_image_data)
-        self.main_view.addItem(self.image_item)
+        self.show_image(normalized_image_data)
 
     def set_ROI(self):
         """
@@ -358,9 +585,10 @@ class MainWindow(QMainWindow):
         """
         self.cam_roi_pos = self.cam_roi.pos()
         self.cam_roi_size = self.cam_roi.size()
-        x, y, w, h = self.cam_roi_pos[0], self.cam_roi_pos[1], self.cam_roi_size[0], self.cam_roi_size[1]
-        self.cam_roi_data = self.image_data[int(
-            y):int(y + h), int(x):int(x + w)]
+        # Bounds kept as ints, the data within the ROI is a view
+        self.cam_roi_bounds = tuple(int(v) for v in (self.cam_roi_pos[0], self.cam_roi_pos[1], self.cam_roi_size[0], self.cam_roi_size[1]))
+        x, y, w, h = self.cam_roi_bounds
+        self.cam_roi_data = self.image_data[y:y + h, x:x + w]
 
     def apply_ROI(self):
         """
@@ -427,16 +655,24 @@ class MainWindow(QMainWindow):
         self.crosshair_v = pg.PlotCurveItem(x=[self.x_coord, self.x_coord], y=[y_range[0], y_range[1]], pen={'color': 'r', 'width': 1})
         self.main_view.addItem(self.crosshair_v)
         
-        # display to the cuts PlotWidgets
-        Hcut = self.image_data[:, int(self.y_coord)]
-        Vcut = self.image_data[int(self.x_coord), :]
-        x_values = np.arange(len(Vcut))
+        self._update_cuts()
+        
+    def _update_cuts(self):
+        # display to the cuts PlotWidgets, copied in the preallocated cut buffers: the column of
+        # the vertical cut is strided in the image, but contiguous once copied. The cuts are taken
+        # in the OD of the displayed frame, published by the Worker or computed by refreshImage
+        if self.od_image is None:
+            return
+        self._ensure_buffers(self.od_image.shape)
+        Hcut = self._hcut_buf
+        Vcut = self._vcut_buf
+        Hcut[:] = self.od_image[int(self.y_coord), :]
+        Vcut[:] = self.od_image[:, int(self.x_coord)]
         new_x = Vcut
-        new_y = x_values
-        self.ui.widget_Hcut.clear()
-        self.ui.widget_Vcut.clear()
-        self.ui.widget_Hcut.plot(Hcut)
-        self.ui.widget_Vcut.plot(new_x, new_y)         
+        new_y = self._yvals
+        # The OD is finite, 0 where either frame is 0, pyqtgraph does not need to check each sample
+        self._hcut_curve.setData(Hcut, connect='all', skipFiniteCheck=True)
+        self._vcut_curve.setData(new_x, new_y, connect='all', skipFiniteCheck=True)
     
     def clear_crosshair(self):
         # Remove existing crosshair
@@ -1,29 +1,71 @@
-from PyQt5.QtCore import QThread
-import logging, threading
+from PyQt5.QtCore import QThread, pyqtSignal
+import numpy as np
+import logging, queue, threading
 
 logging.basicConfig(level=logging.DEBUG)
 
 
 class Worker(QThread):
-    def __init__(self, window):
+    # Emitted once per frame put in the queue, received in the main thread which takes it from
+    # there and displays it. The colored frame is queued along with its OD, read by the cuts of
+    # the crosshair; the queue, not the signal, carries the frames and holds the acquisition back
+    frameReady = pyqtSignal()
+
+    def __init__(self, window, maxsize=2):
         super().__init__()
         self.window = window
-        self.requestStop = False
+        # (OD, colored) frame pairs waiting to be displayed. When the UI lags behind, putting a new
+        # one blocks until the UI takes one, which holds the acquisition back
+        self.frames = queue.Queue(maxsize=maxsize)
+        # Ring of the (OD, RGBA) buffer pairs the frames are computed in. It is large enough for the
+        # queued frames, the one waiting for the display timer, the one displayed and the one written
+        self._ring = [None] * (maxsize + 3)
+        self._ring_index = 0
+        # Scratch buffers (scaled image, colormap indices) of the coloring, owned by the Worker so
+        # that it never writes the buffers of the main thread
+        self._scratch = None
+        self.requestStop = threading.Event()
 
     def run(self):
         try:
             logging.info("WorkerThread   : Starting")
-            while True:
-
-                # Perform your thread's operation here
-                self.window._acquire_images()
+            while not self.requestStop.is_set():
 
-                # Check for thread interruption request
-                #if self.isInterruptionRequested():
-                if self.requestStop:
-                    logging.info("WorkerThread   : Shutting down")
+                # The acquisition, OD and colormap run here, Qt objects are left to the main thread
+                img = self.window._acquire_images()
+                if img is not None:
+                    od, rgba = self._next_buffers(img[0].shape)
+                    scratch = self._scratch_buffers(img[0].shape)
+                    self.window.colorize_OD(img[1], img[0], od, rgba, scratch)
+                    self._put(od, rgba)
 
-                    break
+            logging.info("WorkerThread   : Shutting down")
                 
         except Exception as e:
             logging.exception(f"Exception in thread: {str(e)}")
+
+    def _next_buffers(self, shape):
+        # Next (OD, RGBA) pair of the ring, (re)allocated if the frame shape changed
+        bufs = self._ring[self._ring_index]
+        if bufs is None or bufs[0].shape != shape:
+            bufs = (np.empty(shape, dtype=np.float32), np.empty((*shape, 4), dtype=np.uint8))
+            self._ring[self._ring_index] = bufs
+        self._ring_index = (self._ring_index + 1) % len(self._ring)
+        return bufs
+
+    def _scratch_buffers(self, shape):
+        # Scratch buffers, (re)allocated if the frame shape changed
+        if self._scratch is None or self._scratch[0].shape != shape:
+            self._scratch = (np.empty(shape, dtype=np.float32),
+                             np.empty(shape, dtype=np.uint8))
+        return self._scratch
+
+    def _put(self, od, rgba):
+        # Blocks while the queue is full, waking up regularly to give up if a stop is requested
+        while not self.requestStop.is_set():
+            try:
+                self.frames.put((od, rgba), timeout=0.1)
+            except queue.Full:
+                continue
+            self.frameReady.emit()
+            return
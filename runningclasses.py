@@ -1,10 +1,24 @@
 from Classes.ClassAnalysOD import AnalyseOD
 import matplotlib.pyplot as plt
 import numpy as np 
+import os
 import pandas as pd
 
-bright = np.array(pd.read_csv('DATA/bright.csv', delimiter=';'))
-dark = np.array(pd.read_csv('DATA/image.csv', delimiter=';'))
+
+def _load_image(path_csv):
+    # Loads a frame saved as CSV. The first load parses the CSV, with the C parser of pandas
+    # straight to float32, and caches it next to it as .npy, which the following loads map from disk
+    # as long as the CSV is not newer than the cache
+    npy = path_csv.replace('.csv', '.npy')
+    if os.path.exists(npy) and os.path.getmtime(npy) >= os.path.getmtime(path_csv):
+        return np.load(npy, mmap_mode='r')
+    arr = pd.read_csv(path_csv, sep=';', header=None, dtype=np.float32, engine='c').to_numpy(copy=False)
+    np.save(npy, arr)
+    return arr
+
+
+bright = _load_image('DATA/bright.csv')
+dark = _load_image('DATA/image.csv')
 
 a_ROI = [100, 400, 100, 400]
 n_ROI = [500, 620, 80, 425]
@@ -1,35 +1,50 @@
+import math
 import numpy as np
 import matplotlib.pyplot as plt
+from numba import njit, prange
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _gaussian_2d_kernel(x, y, x0, y0, sigma, A, out):
+    """
+    Fills out[i, j] with the 2D Gaussian evaluated at (x[j], y[i]), in a single pass over the grid.
+    """
+    inv = -0.5 / (sigma * sigma)
+    for i in prange(y.shape[0]):
+        dy = y[i] - y0
+        for j in range(x.shape[0]):
+            dx = x[j] - x0
+            out[i, j] = A * math.exp((dx * dx + dy * dy) * inv)
+
 
 def gaussian_2d(x, y, x0, y0, sigma, A):
     """
     Compute the value of a 2D Gaussian function at given coordinates.
 
     Parameters:
-        x (numpy array): x-coordinates where to evaluate the Gaussian.
-        y (numpy array): y-coordinates where to evaluate the Gaussian.
+        x (numpy array): x-coordinates where to evaluate the Gaussian, open grid of shape (1, W).
+        y (numpy array): y-coordinates where to evaluate the Gaussian, open grid of shape (H, 1).
         x0 (float): x-coordinate of the center of the Gaussian.
         y0 (float): y-coordinate of the center of the Gaussian.
         sigma (float): Standard deviation along both x and y axes.
         A (float): Amplitude of the Gaussian.
 
     Returns:
-        numpy array: Values of the Gaussian at the given coordinates.
+        numpy array: Values of the Gaussian at the given coordinates, of shape (H, W).
     """
-    exponent = ((x - x0) ** 2 + (y - y0) ** 2) / (2 * sigma ** 2)
-    return A * np.exp(-exponent)
+    out = np.empty((y.size, x.size))
+    _gaussian_2d_kernel(x.ravel(), y.ravel(), x0, y0, sigma, A, out)
+    return out
 
 # Example usage:
 image_width = 100
 image_height = 100
-x = np.linspace(0, image_width - 1, image_width)
-y = np.linspace(0, image_height - 1, image_height)
-x_mesh, y_mesh = np.meshgrid(x, y)
+y_m, x_m = np.ogrid[0:image_height, 0:image_width]   # broadcastable, not materialized
 x0 = image_width / 2  # Center of the Gaussian in x-direction
 y0 = image_height / 2  # Center of the Gaussian in y-direction
 sigma = 10
 A = 1
-z_values = gaussian_2d(x_mesh, y_mesh, x0, y0, sigma, A)
+z_values = gaussian_2d(x_m, y_m, x0, y0, sigma, A)
 
 # Plotting
 plt.imshow(z_values, cmap='viridis', extent=[0, image_width, 0, image_height])